@@ -1,14 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel
+from typing import Annotated, List, Optional
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from cachetools import TTLCache
 import firebase_admin
+import jwt
+import msgspec
+import orjson
+from cryptography import x509
 from firebase_admin import credentials, firestore, auth
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
 import os
 from dotenv import load_dotenv
 import logging
+import asyncio
+import base64
+import functools
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
 from starlette.responses import JSONResponse 
 from starlette.requests import Request
 
@@ -38,14 +59,64 @@ if not firebase_admin._apps:
     except Exception as e:
         logger.error(f"Failed to initialize Firebase: {str(e)}")
 
-# Get Firestore client
-db = firestore.client()
+# Firestore client pool: each client has its own gRPC channel, so concurrent
+# requests are spread across several connections instead of one. The clients
+# are blocking, so routes run their calls via asyncio.to_thread.
+FIRESTORE_POOL_SIZE = max(int(os.getenv("FIRESTORE_POOL_SIZE", 4)), 1)
+
+def create_firestore_client() -> firestore.Client:
+    """Create an additional Firestore client for the default Firebase app"""
+    firebase_app = firebase_admin.get_app()
+    return firestore.Client(
+        credentials=firebase_app.credential.get_credential(),
+        project=firebase_app.project_id
+    )
+
+def build_db_pool(size: int) -> List[firestore.Client]:
+    """Build a pool of Firestore clients, starting with the Firebase app's own client"""
+    return [firestore.client()] + [create_firestore_client() for _ in range(size - 1)]
+
+_db_pool = build_db_pool(FIRESTORE_POOL_SIZE)
+_db_cycle = itertools.cycle(_db_pool)
+
+def get_db() -> firestore.Client:
+    """Return the next Firestore client from the pool (round-robin)"""
+    return next(_db_cycle)
+
+# Notes are stored under users/{uid}/notes/{note_id}, so a user can only ever
+# reach their own notes and ownership needs no extra read
+USERS_COLLECTION = "users"
+NOTES_COLLECTION = "notes"
+
+# Query constants resolved once instead of on every request
+DESCENDING = firestore.Query.DESCENDING
+DOCUMENT_ID = FieldPath.document_id()
+
+@functools.lru_cache(maxsize=None)
+def users_collection(db: firestore.Client) -> firestore.CollectionReference:
+    """Return the users collection reference for a client, built once per client"""
+    return db.collection(USERS_COLLECTION)
+
+def notes_collection(db: firestore.Client, user_id: str) -> firestore.CollectionReference:
+    """Return the notes subcollection of a user"""
+    return users_collection(db).document(user_id).collection(NOTES_COLLECTION)
+
+# Application lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the token signing certificates before serving traffic and keep them fresh"""
+    max_age = await prime_certificates()
+    cert_refresh_task = asyncio.create_task(refresh_certificates(max_age))
+    yield
+    cert_refresh_task.cancel()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Notes API",
     description="A secure API for managing notes with Firebase integration",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -53,21 +124,127 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure appropriately for production
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["authorization", "content-type"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compress larger responses (note lists are highly compressible JSON)
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
 # Security scheme
 security = HTTPBearer()
 
-# Pydantic models
-class NoteCreate(BaseModel):
-    title: str = Field(..., min_length=1, max_length=255, description="Note title")
-    content: str = Field(..., description="Note content")
+# Cache of verified ID tokens, keyed by token hash, to skip repeat signature checks
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 60))
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+# Google's public certificates used to sign Firebase ID tokens
+FIREBASE_CERT_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+CERT_REFRESH_DEFAULT = 3600
+CERT_REFRESH_MIN = 60
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+# Public keys parsed from the signing certificates (keyed by "kid") and the
+# project they verify tokens for; replaced as a whole on every refresh
+_signing_keys: dict = {}
+_signing_project_id: Optional[str] = None
+
+# Last Firestore health probe, served by /health until it is older than the interval.
+# A probe gives up after HEALTH_CHECK_TIMEOUT, and a result older than
+# HEALTH_CHECK_MAX_AGE is not trusted even while a newer probe is in flight.
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_TIMEOUT = 10
+HEALTH_CHECK_MAX_AGE = 3 * HEALTH_CHECK_INTERVAL
+_health = {"status": "unknown", "checked_at": 0.0}
+_health_refresh_task: Optional[asyncio.Task] = None
+
+# Maximum number of writes Firestore accepts in a single batch
+BATCH_WRITE_LIMIT = 500
+
+# Note fields stored in Firestore (selectable via ?fields=)
+NOTE_FIELDS = ("title", "content", "created_at", "updated_at", "user_id")
+
+# Request bodies (msgspec structs, decoded and validated by msgspec_body)
+Title = Annotated[str, msgspec.Meta(min_length=1, max_length=255, description="Note title")]
+Content = Annotated[str, msgspec.Meta(description="Note content")]
+
+class NoteCreate(msgspec.Struct):
+    title: Title
+    content: Content
+
+class NoteUpdate(msgspec.Struct):
+    title: Optional[Title] = None
+    content: Optional[Content] = None
+
+class NoteBulkCreate(msgspec.Struct):
+    notes: Annotated[
+        List[NoteCreate],
+        msgspec.Meta(min_length=1, max_length=2000, description="Notes to create")
+    ]
+
+# A single Firestore document ID: no "/" and not "." or ".."
+NoteId = Annotated[str, msgspec.Meta(min_length=1, pattern=r"^(?!\.\.?$)[^/]+$")]
 
-class NoteUpdate(BaseModel):
-    title: Optional[str] = Field(None, min_length=1, max_length=255, description="Note title")
-    content: Optional[str] = Field(None, description="Note content")
+class NoteBatchGet(msgspec.Struct):
+    ids: Annotated[
+        List[NoteId],
+        msgspec.Meta(min_length=1, max_length=100, description="Note IDs to fetch")
+    ]
+
+# JSON schemas of the request bodies, merged into the OpenAPI components
+_, REQUEST_SCHEMAS = msgspec.json.schema_components(
+    (NoteCreate, NoteUpdate, NoteBulkCreate, NoteBatchGet),
+    ref_template="#/components/schemas/{name}"
+)
+
+def msgspec_body(struct_type: type):
+    """
+    Build a dependency that decodes and validates the JSON request body into
+    a msgspec struct, answering 422 in FastAPI's usual {"detail": [...]} format
+    """
+    decoder = msgspec.json.Decoder(struct_type)
+    
+    async def decode_body(request: Request):
+        try:
+            return decoder.decode(await request.body())
+        except msgspec.ValidationError as e:
+            # msgspec reports the location as "... - at `$.notes[0].title`"
+            message, _, path = str(e).partition(" - at `$")
+            loc = ["body"] + [
+                int(index) if index else key
+                for key, index in re.findall(r"\.(\w+)|\[(\d+)\]", path)
+            ]
+            # A missing field is reported at its parent object, so point at the field itself
+            missing = re.match(r"Object missing required field `(\w+)`", message)
+            if missing:
+                loc.append(missing.group(1))
+            error_type = "missing" if missing else "value_error"
+            raise RequestValidationError([{"type": error_type, "loc": loc, "msg": message}])
+        except msgspec.DecodeError as e:
+            raise RequestValidationError([{"type": "json_invalid", "loc": ["body"], "msg": str(e)}])
+    
+    return decode_body
+
+def request_body_schema(struct_type: type) -> dict:
+    """OpenAPI request body referencing the schema of a msgspec struct"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": f"#/components/schemas/{struct_type.__name__}"}
+                }
+            }
+        }
+    }
+
+# Pydantic models
+class NoteBulkCreateResponse(BaseModel):
+    ids: List[str]
 
 class NoteResponse(BaseModel):
     id: str
@@ -77,6 +254,14 @@ class NoteResponse(BaseModel):
     updated_at: str
     user_id: str
 
+class NoteListItem(BaseModel):
+    id: str
+    title: Optional[str] = None
+    content: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    user_id: Optional[str] = None
+
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str] = None
@@ -92,15 +277,26 @@ async def get_current_user(authorization: str = Header(None)):
             detail="Authorization header missing"
         )
     
+    # Extract token from "Bearer <token>"
+    token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid authentication token"
+        )
+    
     try:
-        # Extract token from "Bearer <token>"
-        if authorization.startswith("Bearer "):
-            token = authorization.split(" ")[1]
-        else:
-            token = authorization
+        # Reuse a previously verified token until it expires
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with _token_cache_lock:
+            cached_token = _token_cache.get(cache_key)
+        if cached_token and cached_token.get('exp', 0) > time.time():
+            return cached_token
         
         # Verify the ID token
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = verify_id_token(token)
+        with _token_cache_lock:
+            _token_cache[cache_key] = decoded_token
         return decoded_token
     
     except auth.InvalidIdTokenError:
@@ -120,24 +316,130 @@ async def get_current_user(authorization: str = Header(None)):
             detail="Authentication failed"
         )
 
+def verify_id_token(token: str) -> dict:
+    """
+    Verify a Firebase ID token against the pre-parsed signing keys, falling back
+    to the Firebase SDK when the signing key is not known yet
+    """
+    signing_keys, project_id = _signing_keys, _signing_project_id
+    try:
+        key_id = jwt.get_unverified_header(token).get("kid")
+    except jwt.InvalidTokenError:
+        key_id = None
+    public_key = signing_keys.get(key_id)
+    if public_key is None or not project_id:
+        return auth.verify_id_token(token)
+    
+    try:
+        claims = jwt.decode(
+            token,
+            public_key,
+            algorithms=["RS256"],
+            audience=project_id,
+            issuer=FIREBASE_ISSUER_PREFIX + project_id,
+            options={"require": ["exp", "iat", "sub"]}
+        )
+    except jwt.ExpiredSignatureError as e:
+        raise auth.ExpiredIdTokenError("Firebase ID token has expired", cause=e)
+    except jwt.InvalidTokenError as e:
+        raise auth.InvalidIdTokenError(f"Invalid Firebase ID token: {str(e)}", cause=e)
+    
+    subject = claims["sub"]
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise auth.InvalidIdTokenError('Firebase ID token has an invalid "sub" claim')
+    claims["uid"] = subject
+    return claims
+
+def prime_certificate_cache() -> int:
+    """
+    Fetch the token signing certificates through the Firebase SDK's cache-aware
+    session so verify_id_token finds them cached, and parse their public keys
+    once for verify_id_token. Returns the max-age in seconds.
+    """
+    global _signing_keys, _signing_project_id
+    # The SDK's verifier keeps one requests.Session for its lifetime, so refreshes
+    # reuse pooled keep-alive connections rather than opening new ones
+    request = auth._get_client(None)._token_verifier.request
+    response = request(FIREBASE_CERT_URL)
+    certificates = json.loads(response.data)
+    _signing_keys = {
+        key_id: x509.load_pem_x509_certificate(pem.encode()).public_key()
+        for key_id, pem in certificates.items()
+    }
+    _signing_project_id = firebase_admin.get_app().project_id
+    match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return int(match.group(1)) if match else CERT_REFRESH_DEFAULT
+
+async def prime_certificates() -> int:
+    """Fetch the signing certificates once, returning seconds until the next refresh"""
+    try:
+        max_age = await asyncio.to_thread(prime_certificate_cache)
+        logger.info(f"Primed Firebase certificate cache (max-age {max_age}s)")
+        return max_age
+    except Exception as e:
+        logger.warning(f"Failed to prime Firebase certificate cache: {str(e)}")
+        return CERT_REFRESH_MIN
+
+async def refresh_certificates(max_age: int):
+    """Keep the signing certificate cache warm, refreshing when it expires"""
+    while True:
+        await asyncio.sleep(max(max_age, CERT_REFRESH_MIN))
+        max_age = await prime_certificates()
+
+async def refresh_health():
+    """Probe Firestore with a test write and record the result for /health"""
+    try:
+        test_ref = get_db().collection('health_check').document('test')
+        
+        def probe():
+            test_ref.set({"timestamp": firestore.SERVER_TIMESTAMP}, timeout=HEALTH_CHECK_TIMEOUT)
+            test_ref.delete(timeout=HEALTH_CHECK_TIMEOUT)
+        
+        # The RPC timeouts do not cover retries, so bound the probe as a whole too
+        await asyncio.wait_for(asyncio.to_thread(probe), timeout=HEALTH_CHECK_TIMEOUT)
+        status = "healthy"
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        status = "unhealthy"
+    _health.update(status=status, checked_at=time.time())
+
 # Utility functions
 def format_timestamp(timestamp):
     """Convert Firestore timestamp to ISO string"""
+    # Firestore returns timezone-aware UTC datetimes, which format directly
+    if isinstance(timestamp, datetime):
+        return timestamp.isoformat()
     if hasattr(timestamp, 'timestamp'):
         return datetime.fromtimestamp(timestamp.timestamp(), tz=timezone.utc).isoformat()
     return timestamp
 
 def note_doc_to_dict(doc_id: str, doc_data: dict) -> dict:
     """Convert Firestore document to dictionary with proper formatting"""
+    get = doc_data.get
     return {
         "id": doc_id,
-        "title": doc_data.get("title", ""),
-        "content": doc_data.get("content", ""),
-        "created_at": format_timestamp(doc_data.get("created_at")),
-        "updated_at": format_timestamp(doc_data.get("updated_at")),
-        "user_id": doc_data.get("user_id", "")
+        "title": get("title", ""),
+        "content": get("content", ""),
+        "created_at": format_timestamp(get("created_at")),
+        "updated_at": format_timestamp(get("updated_at")),
+        "user_id": get("user_id", "")
     }
 
+def encode_cursor(updated_at: datetime, doc_id: str) -> str:
+    """Build an opaque pagination cursor from the last note of a page"""
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{doc_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Parse a pagination cursor into (updated_at, doc_id)"""
+    try:
+        updated_at, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(updated_at), doc_id
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid pagination cursor"
+        )
+
 # API Routes
 
 @app.get("/")
@@ -147,47 +449,94 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    try:
-        # Test Firestore connection
-        test_ref = db.collection('health_check').document('test')
-        test_ref.set({"timestamp": datetime.now(timezone.utc)})
-        test_ref.delete()
-        
-        return {
-            "status": "healthy",
-            "services": {
-                "firestore": "connected",
-                "firebase_auth": "configured"
-            },
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+    """Detailed health check (Firestore is probed at most every HEALTH_CHECK_INTERVAL seconds)"""
+    global _health_refresh_task
+    
+    # Refresh a stale result in the background, one probe at a time
+    stale = time.time() - _health["checked_at"] > HEALTH_CHECK_INTERVAL
+    if stale and (_health_refresh_task is None or _health_refresh_task.done()):
+        _health_refresh_task = asyncio.create_task(refresh_health())
+    
+    # Until the first probe finishes there is no result to serve, so wait for it
+    if _health["status"] == "unknown":
+        await asyncio.shield(_health_refresh_task)
+    
+    # A result this old means probes keep hanging, which is itself an outage
+    expired = time.time() - _health["checked_at"] > HEALTH_CHECK_MAX_AGE
+    if _health["status"] != "healthy" or expired:
         raise HTTPException(status_code=503, detail="Service unhealthy")
+    
+    return {
+        "status": "healthy",
+        "services": {
+            "firestore": "connected",
+            "firebase_auth": "configured"
+        },
+        "checked_at": datetime.fromtimestamp(_health["checked_at"], tz=timezone.utc).isoformat(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
 
-@app.get("/notes", response_model=List[NoteResponse])
-async def get_notes(current_user: dict = Depends(get_current_user)):
+# Notes are built from trusted Firestore data, so the list is returned as-is
+# instead of being re-validated against the response model
+@app.get("/notes", response_model=None, responses={200: {"model": List[NoteListItem]}})
+async def get_notes(
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of notes to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated note fields to return"),
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get all notes for the authenticated user
+    Get a page of notes for the authenticated user, most recently updated first.
+    The cursor for the next page is returned in the X-Next-Cursor header.
     """
     try:
         user_id = current_user['uid']
         logger.info(f"Fetching notes for user: {user_id}")
         
-        # Query notes for the current user
-        notes_ref = db.collection('notes')
-        query = notes_ref.where('user_id', '==', user_id).order_by('updated_at', direction=firestore.Query.DESCENDING)
-        docs = query.stream()
+        # Resolve the field projection (updated_at is always read for the cursor)
+        if fields:
+            selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+            unknown = set(selected) - set(NOTE_FIELDS)
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+                )
+        else:
+            selected = NOTE_FIELDS
+        projection = sorted(set(selected) | {"updated_at"})
+        
+        # Query one page of notes for the current user
+        notes_ref = notes_collection(get_db(), user_id)
+        query = (
+            notes_ref.select(projection)
+            .order_by('updated_at', direction=DESCENDING)
+            .order_by(DOCUMENT_ID, direction=DESCENDING)
+        )
+        if cursor:
+            query = query.start_after(list(decode_cursor(cursor)))
+        docs = await asyncio.to_thread(lambda: list(query.limit(limit).stream()))
         
-        notes = []
-        for doc in docs:
-            note_data = note_doc_to_dict(doc.id, doc.to_dict())
-            notes.append(note_data)
+        if selected == NOTE_FIELDS:
+            notes = [note_doc_to_dict(doc.id, doc.to_dict()) for doc in docs]
+        else:
+            keys = ("id",) + selected
+            notes = []
+            for doc in docs:
+                note_data = note_doc_to_dict(doc.id, doc.to_dict())
+                notes.append({key: note_data[key] for key in keys})
+        
+        # A full page means there may be more notes after it
+        headers = {}
+        if len(docs) == limit:
+            last = docs[-1]
+            headers["X-Next-Cursor"] = encode_cursor(last.to_dict()["updated_at"], last.id)
         
         logger.info(f"Retrieved {len(notes)} notes for user: {user_id}")
-        return notes
+        return ORJSONResponse(content=notes, headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching notes: {str(e)}")
         raise HTTPException(
@@ -195,8 +544,58 @@ async def get_notes(current_user: dict = Depends(get_current_user)):
             detail="Failed to retrieve notes"
         )
 
-@app.post("/notes", response_model=NoteResponse, status_code=201)
-async def create_note(note: NoteCreate, current_user: dict = Depends(get_current_user)):
+@app.get("/notes/export", response_model=None, responses={200: {"model": List[NoteResponse]}})
+async def export_notes(current_user: dict = Depends(get_current_user)):
+    """
+    Stream all notes of the authenticated user as a JSON array, most recently
+    updated first. Notes are sent as Firestore yields them, so memory use does
+    not grow with the number of notes.
+    """
+    try:
+        user_id = current_user['uid']
+        logger.info(f"Exporting notes for user: {user_id}")
+        query = notes_collection(get_db(), user_id).order_by('updated_at', direction=DESCENDING)
+        
+        # Read the first note before responding, so failures to start the query
+        # still surface as an error status instead of an empty 200
+        docs = query.stream()
+        first_doc = await asyncio.to_thread(next, docs, None)
+    
+    except Exception as e:
+        logger.error(f"Error exporting notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to export notes"
+        )
+    
+    # A sync generator, so Starlette pulls each remaining document in a worker thread
+    def generate_notes():
+        count = 0
+        yield b"["
+        if first_doc is not None:
+            try:
+                for doc in itertools.chain((first_doc,), docs):
+                    prefix = b"," if count else b""
+                    yield prefix + orjson.dumps(note_doc_to_dict(doc.id, doc.to_dict()))
+                    count += 1
+            except Exception as e:
+                logger.error(f"Error exporting notes after {count} notes: {str(e)}")
+                raise
+        yield b"]"
+        logger.info(f"Exported {count} notes for user: {user_id}")
+    
+    return StreamingResponse(generate_notes(), media_type="application/json")
+
+@app.post(
+    "/notes",
+    response_model=NoteResponse,
+    status_code=201,
+    openapi_extra=request_body_schema(NoteCreate)
+)
+async def create_note(
+    current_user: dict = Depends(get_current_user),
+    note: NoteCreate = Depends(msgspec_body(NoteCreate))
+):
     """
     Create a new note for the authenticated user
     """
@@ -204,22 +603,24 @@ async def create_note(note: NoteCreate, current_user: dict = Depends(get_current
         user_id = current_user['uid']
         logger.info(f"Creating note for user: {user_id}")
         
-        # Create note document
-        now = datetime.now(timezone.utc)
+        # Create note document, timestamped by the Firestore server
         note_data = {
             "title": note.title,
             "content": note.content,
             "user_id": user_id,
-            "created_at": now,
-            "updated_at": now
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP
         }
         
         # Add to Firestore
-        doc_ref = db.collection('notes').add(note_data)
-        doc_id = doc_ref[1].id
+        notes_ref = notes_collection(get_db(), user_id)
+        update_time, doc_ref = await asyncio.to_thread(notes_ref.add, note_data)
+        doc_id = doc_ref.id
         
-        # Return created note
-        created_note = note_doc_to_dict(doc_id, note_data)
+        # Server timestamps resolve to the write's commit time
+        created_note = note_doc_to_dict(
+            doc_id, {**note_data, "created_at": update_time, "updated_at": update_time}
+        )
         logger.info(f"Created note with ID: {doc_id} for user: {user_id}")
         
         return created_note
@@ -231,6 +632,116 @@ async def create_note(note: NoteCreate, current_user: dict = Depends(get_current
             detail="Failed to create note"
         )
 
+@app.post(
+    "/notes/bulk",
+    response_model=NoteBulkCreateResponse,
+    status_code=201,
+    openapi_extra=request_body_schema(NoteBulkCreate)
+)
+async def bulk_create_notes(
+    current_user: dict = Depends(get_current_user),
+    bulk: NoteBulkCreate = Depends(msgspec_body(NoteBulkCreate))
+):
+    """
+    Create many notes for the authenticated user using batched writes
+    """
+    try:
+        user_id = current_user['uid']
+        logger.info(f"Bulk creating {len(bulk.notes)} notes for user: {user_id}")
+        
+        # Group the writes into batches of at most BATCH_WRITE_LIMIT operations
+        db = get_db()
+        notes_ref = notes_collection(db, user_id)
+        batches = []
+        for start in range(0, len(bulk.notes), BATCH_WRITE_LIMIT):
+            batch = db.batch()
+            batch_ids = []
+            for note in bulk.notes[start:start + BATCH_WRITE_LIMIT]:
+                doc_ref = notes_ref.document()
+                batch.set(doc_ref, {
+                    "title": note.title,
+                    "content": note.content,
+                    "user_id": user_id,
+                    "created_at": firestore.SERVER_TIMESTAMP,
+                    "updated_at": firestore.SERVER_TIMESTAMP
+                })
+                batch_ids.append(doc_ref.id)
+            batches.append((batch, batch_ids))
+    
+    except Exception as e:
+        logger.error(f"Error bulk creating notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to create notes"
+        )
+    
+    # Commit the batches in order, stopping at the first failure so the client
+    # learns exactly which notes were written and can retry only the rest
+    committed_ids = []
+    for batch, batch_ids in batches:
+        try:
+            await asyncio.to_thread(batch.commit)
+        except Exception as e:
+            logger.error(
+                f"Error bulk creating notes for user {user_id} after committing "
+                f"{len(committed_ids)} notes: {str(e)}; committed IDs: {committed_ids}"
+            )
+            return ORJSONResponse(
+                status_code=500,
+                content={
+                    "error": "Failed to create all notes",
+                    "status_code": 500,
+                    "ids": committed_ids
+                }
+            )
+        committed_ids.extend(batch_ids)
+    
+    logger.info(f"Created {len(committed_ids)} notes in {len(batches)} batches for user: {user_id}")
+    return {"ids": committed_ids}
+
+@app.post(
+    "/notes/batch-get",
+    response_model=List[NoteResponse],
+    openapi_extra=request_body_schema(NoteBatchGet)
+)
+async def batch_get_notes(
+    current_user: dict = Depends(get_current_user),
+    batch: NoteBatchGet = Depends(msgspec_body(NoteBatchGet))
+):
+    """
+    Get several notes by ID in a single round-trip (missing notes are omitted)
+    """
+    try:
+        user_id = current_user['uid']
+        logger.info(f"Batch fetching {len(batch.ids)} notes for user: {user_id}")
+        
+        # Fetch all requested documents (duplicates once) in one streaming RPC
+        db = get_db()
+        notes_ref = notes_collection(db, user_id)
+        requested_ids = list(dict.fromkeys(batch.ids))
+        doc_refs = [notes_ref.document(note_id) for note_id in requested_ids]
+        
+        found = {}
+        docs = await asyncio.to_thread(lambda: list(db.get_all(doc_refs)))
+        for doc in docs:
+            if doc.exists:
+                found[doc.id] = note_doc_to_dict(doc.id, doc.to_dict())
+        
+        # Preserve the requested order
+        notes = [found[note_id] for note_id in requested_ids if note_id in found]
+        
+        logger.info(
+            f"Retrieved {len(notes)} of {len(batch.ids)} requested notes for user: {user_id}"
+        )
+        return notes
+        
+    except Exception as e:
+        logger.error(f"Error batch fetching notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve notes"
+        )
+
 @app.get("/notes/{note_id}", response_model=NoteResponse)
 async def get_note(note_id: str, current_user: dict = Depends(get_current_user)):
     """
@@ -241,8 +752,8 @@ async def get_note(note_id: str, current_user: dict = Depends(get_current_user))
         logger.info(f"Fetching note {note_id} for user: {user_id}")
         
         # Get the note document
-        doc_ref = db.collection('notes').document(note_id)
-        doc = doc_ref.get()
+        doc_ref = notes_collection(get_db(), user_id).document(note_id)
+        doc = await asyncio.to_thread(doc_ref.get)
         
         if not doc.exists:
             raise HTTPException(
@@ -252,13 +763,6 @@ async def get_note(note_id: str, current_user: dict = Depends(get_current_user))
         
         note_data = doc.to_dict()
         
-        # Check if the note belongs to the current user
-        if note_data.get('user_id') != user_id:
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied. This note doesn't belong to you."
-            )
-        
         return note_doc_to_dict(note_id, note_data)
         
     except HTTPException:
@@ -270,8 +774,16 @@ async def get_note(note_id: str, current_user: dict = Depends(get_current_user))
             detail="Failed to retrieve note"
         )
 
-@app.put("/notes/{note_id}", response_model=NoteResponse)
-async def update_note(note_id: str, note: NoteUpdate, current_user: dict = Depends(get_current_user)):
+@app.put(
+    "/notes/{note_id}",
+    response_model=NoteResponse,
+    openapi_extra=request_body_schema(NoteUpdate)
+)
+async def update_note(
+    note_id: str,
+    current_user: dict = Depends(get_current_user),
+    note: NoteUpdate = Depends(msgspec_body(NoteUpdate))
+):
     """
     Update a specific note by ID (only if it belongs to the authenticated user)
     """
@@ -279,9 +791,10 @@ async def update_note(note_id: str, note: NoteUpdate, current_user: dict = Depen
         user_id = current_user['uid']
         logger.info(f"Updating note {note_id} for user: {user_id}")
         
-        # Get the note document first to verify ownership
-        doc_ref = db.collection('notes').document(note_id)
-        doc = doc_ref.get()
+        # Get the current note to build the response from
+        db = get_db()
+        doc_ref = notes_collection(db, user_id).document(note_id)
+        doc = await asyncio.to_thread(doc_ref.get)
         
         if not doc.exists:
             raise HTTPException(
@@ -291,33 +804,31 @@ async def update_note(note_id: str, note: NoteUpdate, current_user: dict = Depen
         
         existing_data = doc.to_dict()
         
-        # Check if the note belongs to the current user
-        if existing_data.get('user_id') != user_id:
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied. This note doesn't belong to you."
-            )
-        
         # Prepare update data
-        update_data = {"updated_at": datetime.now(timezone.utc)}
+        update_data = {"updated_at": firestore.SERVER_TIMESTAMP}
         
         if note.title is not None:
             update_data["title"] = note.title
         if note.content is not None:
             update_data["content"] = note.content
         
-        # Update the document
-        doc_ref.update(update_data)
-        
-        # Get the updated document
-        updated_doc = doc_ref.get()
-        updated_data = updated_doc.to_dict()
+        # Update only if the note is unchanged since it was read
+        write_result = await asyncio.to_thread(
+            doc_ref.update, update_data, option=db.write_option(last_update_time=doc.update_time)
+        )
         
         logger.info(f"Updated note {note_id} for user: {user_id}")
-        return note_doc_to_dict(note_id, updated_data)
+        return note_doc_to_dict(
+            note_id, {**existing_data, **update_data, "updated_at": write_result.update_time}
+        )
         
     except HTTPException:
         raise
+    except FailedPrecondition:
+        raise HTTPException(
+            status_code=409,
+            detail="Note was modified concurrently. Please retry."
+        )
     except Exception as e:
         logger.error(f"Error updating note: {str(e)}")
         raise HTTPException(
@@ -334,33 +845,19 @@ async def delete_note(note_id: str, current_user: dict = Depends(get_current_use
         user_id = current_user['uid']
         logger.info(f"Deleting note {note_id} for user: {user_id}")
         
-        # Get the note document first to verify ownership
-        doc_ref = db.collection('notes').document(note_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(
-                status_code=404,
-                detail="Note not found"
-            )
-        
-        note_data = doc.to_dict()
-        
-        # Check if the note belongs to the current user
-        if note_data.get('user_id') != user_id:
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied. This note doesn't belong to you."
-            )
-        
-        # Delete the document
-        doc_ref.delete()
+        # Delete the note in a single call, failing if it does not exist
+        db = get_db()
+        doc_ref = notes_collection(db, user_id).document(note_id)
+        await asyncio.to_thread(doc_ref.delete, option=db.write_option(exists=True))
         
         logger.info(f"Deleted note {note_id} for user: {user_id}")
         return  # 204 No Content
         
-    except HTTPException:
-        raise
+    except NotFound:
+        raise HTTPException(
+            status_code=404,
+            detail="Note not found"
+        )
     except Exception as e:
         logger.error(f"Error deleting note: {str(e)}")
         raise HTTPException(
@@ -390,11 +887,34 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# OpenAPI schema
+def custom_openapi():
+    """Generate the OpenAPI schema, adding the msgspec request body schemas"""
+    if app.openapi_schema:
+        return app.openapi_schema
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes
+    )
+    schema.setdefault("components", {}).setdefault("schemas", {}).update(REQUEST_SCHEMAS)
+    app.openapi_schema = schema
+    return schema
+
+app.openapi = custom_openapi
+
 if __name__ == "__main__":
     import uvicorn
+    
+    # Auto-reload only in development; otherwise run one worker process per
+    # WEB_CONCURRENCY so all cores are used (2 * cores + 1 is a good start).
+    # Uvicorn picks uvloop and httptools automatically when they are installed.
+    reload = os.getenv("ENVIRONMENT", "development") == "development"
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
+        host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", 8000)),
-        reload=True
+        workers=None if reload else int(os.getenv("WEB_CONCURRENCY", 1)),
+        reload=reload
     )
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+One-off migration of notes from the legacy top-level `notes` collection to
+per-user `users/{user_id}/notes/{note_id}` subcollections.
+
+Notes keep their IDs. Notes that already exist at the new path are skipped,
+so the script is safe to re-run and never overwrites edits made after a
+previous run. The legacy documents are left in place.
+
+Usage:
+    python migrate_notes.py [--dry-run]
+"""
+import argparse
+import logging
+
+from main import BATCH_WRITE_LIMIT, NOTES_COLLECTION, get_db, notes_collection
+
+logger = logging.getLogger("migrate_notes")
+
+
+def migrate_legacy_notes(db, dry_run: bool = False) -> dict:
+    """
+    Copy every legacy note that is not yet at its per-user path, in batches of
+    at most BATCH_WRITE_LIMIT writes. Returns counts of copied/skipped/invalid notes.
+    """
+    stats = {"copied": 0, "skipped": 0, "invalid": 0}
+    chunk = []
+
+    def flush():
+        # One get_all per chunk tells which notes were already migrated
+        targets = [notes_collection(db, data["user_id"]).document(doc_id) for doc_id, data in chunk]
+        existing = {snap.reference.path for snap in db.get_all(targets) if snap.exists}
+        batch = db.batch()
+        pending = 0
+        for target, (_, data) in zip(targets, chunk):
+            if target.path in existing:
+                stats["skipped"] += 1
+                continue
+            batch.set(target, data)
+            pending += 1
+        if pending and not dry_run:
+            batch.commit()
+        stats["copied"] += pending
+        chunk.clear()
+
+    for doc in db.collection(NOTES_COLLECTION).stream():
+        data = doc.to_dict()
+        if not data.get("user_id"):
+            logger.warning(f"Skipping legacy note {doc.id} without user_id")
+            stats["invalid"] += 1
+            continue
+        chunk.append((doc.id, data))
+        if len(chunk) == BATCH_WRITE_LIMIT:
+            flush()
+    if chunk:
+        flush()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report what would be copied without writing"
+    )
+    args = parser.parse_args()
+
+    stats = migrate_legacy_notes(get_db(), dry_run=args.dry_run)
+    action = "Would copy" if args.dry_run else "Copied"
+    logger.info(
+        f"{action} {stats['copied']} notes; {stats['skipped']} already migrated, "
+        f"{stats['invalid']} without user_id"
+    )
@@ -1,8 +1,19 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from google.api_core.exceptions import FailedPrecondition, NotFound
 import os
 import sys
+import time
+import asyncio
+import itertools
+import json
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from datetime import datetime, timezone
 
 # Add current directory to Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -10,7 +21,8 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # Mock environment variables before importing main
 with patch.dict(os.environ, {
     'GOOGLE_APPLICATION_CREDENTIALS': 'test-credentials.json',
-    'FIREBASE_PROJECT_ID': 'test-project'
+    'FIREBASE_PROJECT_ID': 'test-project',
+    'FIRESTORE_POOL_SIZE': '1'
 }):
     # Mock Firebase before importing main
     with patch('firebase_admin.initialize_app'), \
@@ -18,7 +30,9 @@ with patch.dict(os.environ, {
          patch('firebase_admin.credentials.Certificate'), \
          patch('firebase_admin.firestore.client'):
         
-        from main import app
+        import main
+        from migrate_notes import migrate_legacy_notes
+        from main import app, _token_cache, prime_certificate_cache, FIREBASE_CERT_URL
 
 # Create test client
 client = TestClient(app)
@@ -27,6 +41,33 @@ client = TestClient(app)
 MOCK_USER_TOKEN = "mock-firebase-token"
 MOCK_USER_ID = "mock-user-123"
 
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Reset the verified token cache between tests"""
+    _token_cache.clear()
+    yield
+    _token_cache.clear()
+
+@pytest.fixture
+def signing_key():
+    """Generate a token signing key and its self-signed certificate"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime(2024, 1, 1, tzinfo=timezone.utc))
+        .not_valid_after(datetime(2100, 1, 1, tzinfo=timezone.utc))
+        .sign(key, hashes.SHA256())
+    )
+    # Restore the module-level key state after the test
+    with patch.object(main, '_signing_keys', {}), \
+         patch.object(main, '_signing_project_id', None):
+        yield key, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
 @pytest.fixture
 def mock_firebase_auth():
     """Mock Firebase authentication"""
@@ -40,8 +81,36 @@ def mock_firebase_auth():
 @pytest.fixture
 def mock_firestore():
     """Mock Firestore database"""
-    with patch('main.db') as mock_db:
-        yield mock_db
+    with patch('main.get_db') as mock_get_db:
+        yield mock_get_db.return_value
+
+def user_notes(mock_db):
+    """Return the mocked notes subcollection of the authenticated user"""
+    return mock_db.collection.return_value.document.return_value.collection.return_value
+
+def notes_query(mock_db):
+    """Return the mocked, ordered notes query built by GET /notes"""
+    return user_notes(mock_db).select.return_value.order_by.return_value.order_by.return_value
+
+def test_db_pool_round_robin():
+    """Test that a pool of several clients is built and used round-robin"""
+    with patch('main.firestore.client') as mock_client, \
+         patch('main.firestore.Client') as mock_client_cls, \
+         patch('main.firebase_admin.get_app') as mock_get_app:
+        mock_get_app.return_value.project_id = "test-project"
+        extra_clients = [MagicMock(), MagicMock()]
+        mock_client_cls.side_effect = extra_clients
+        
+        pool = main.build_db_pool(3)
+        
+        assert pool == [mock_client.return_value] + extra_clients
+        mock_client_cls.assert_called_with(
+            credentials=mock_get_app.return_value.credential.get_credential.return_value,
+            project="test-project"
+        )
+    
+    with patch.object(main, '_db_cycle', itertools.cycle(pool)):
+        assert [main.get_db() for _ in range(4)] == pool + pool[:1]
 
 def test_health_check():
     """Test health check endpoint"""
@@ -49,6 +118,76 @@ def test_health_check():
     assert response.status_code == 200
     assert "Notes API is running" in response.json()["message"]
 
+def test_cors_preflight():
+    """Test CORS preflight for the methods and headers the API uses"""
+    response = client.options(
+        "/notes",
+        headers={
+            "Origin": "https://example.com",
+            "Access-Control-Request-Method": "PUT",
+            "Access-Control-Request-Headers": "Authorization, Content-Type"
+        }
+    )
+    assert response.status_code == 200
+    
+    response = client.options(
+        "/notes",
+        headers={
+            "Origin": "https://example.com",
+            "Access-Control-Request-Method": "PATCH"
+        }
+    )
+    assert response.status_code == 400
+
+@pytest.fixture
+def fresh_health():
+    """Reset the cached health probe result"""
+    with patch.dict(main._health, {"status": "unknown", "checked_at": 0.0}), \
+         patch.object(main, '_health_refresh_task', None):
+        yield
+
+def test_detailed_health_check_cached(fresh_health, mock_firestore):
+    """Test that /health probes Firestore once and serves the cached result"""
+    for _ in range(3):
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+    
+    test_ref = mock_firestore.collection.return_value.document.return_value
+    test_ref.set.assert_called_once()
+    test_ref.delete.assert_called_once()
+
+def test_detailed_health_check_unhealthy(fresh_health, mock_firestore):
+    """Test that a failed Firestore probe reports the service as unhealthy"""
+    test_ref = mock_firestore.collection.return_value.document.return_value
+    test_ref.set.side_effect = Exception("unavailable")
+    
+    response = client.get("/health")
+    assert response.status_code == 503
+
+def test_detailed_health_check_probe_timeout(fresh_health, mock_firestore):
+    """Test that a hanging Firestore probe is bounded and reported as unhealthy"""
+    test_ref = mock_firestore.collection.return_value.document.return_value
+    test_ref.set.side_effect = lambda *args, **kwargs: time.sleep(0.5)
+    
+    with patch.object(main, 'HEALTH_CHECK_TIMEOUT', 0.05):
+        response = client.get("/health")
+    
+    assert response.status_code == 503
+    assert test_ref.set.call_args.kwargs["timeout"] == 0.05
+
+def test_detailed_health_check_expired_result(fresh_health, mock_firestore):
+    """Test that an old healthy result is not served while a probe is in flight"""
+    main._health.update(status="healthy", checked_at=time.time() - main.HEALTH_CHECK_MAX_AGE - 1)
+    
+    async def hanging_probe():
+        await asyncio.sleep(3600)
+    
+    with patch('main.refresh_health', hanging_probe):
+        response = client.get("/health")
+    
+    assert response.status_code == 503
+
 def test_get_notes_unauthorized():
     """Test getting notes without authentication"""
     response = client.get("/notes")
@@ -67,7 +206,7 @@ def test_get_notes_authorized(mock_firebase_auth, mock_firestore):
         "updated_at": "2024-01-01T00:00:00Z"
     }
     
-    mock_firestore.collection.return_value.where.return_value.order_by.return_value.stream.return_value = [mock_doc]
+    notes_query(mock_firestore).limit.return_value.stream.return_value = [mock_doc]
     
     response = client.get(
         "/notes",
@@ -79,6 +218,243 @@ def test_get_notes_authorized(mock_firebase_auth, mock_firestore):
     assert len(notes) == 1
     assert notes[0]["title"] == "Test Note"
 
+def test_get_notes_pagination_cursor(mock_firebase_auth, mock_firestore):
+    """Test that a full page returns a cursor that resumes after its last note"""
+    updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    mock_doc = MagicMock()
+    mock_doc.id = "note-123"
+    mock_doc.to_dict.return_value = {
+        "title": "Test Note",
+        "content": "Test Content",
+        "user_id": MOCK_USER_ID,
+        "created_at": updated_at,
+        "updated_at": updated_at
+    }
+    
+    query = notes_query(mock_firestore)
+    query.limit.return_value.stream.return_value = [mock_doc]
+    
+    response = client.get(
+        "/notes?limit=1",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    query.limit.assert_called_once_with(1)
+    next_cursor = response.headers["X-Next-Cursor"]
+    
+    query.start_after.return_value.limit.return_value.stream.return_value = []
+    response = client.get(
+        f"/notes?limit=1&cursor={next_cursor}",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+    query.start_after.assert_called_once_with([updated_at, "note-123"])
+
+def test_get_notes_field_projection(mock_firebase_auth, mock_firestore):
+    """Test that ?fields= limits both the Firestore projection and the response"""
+    mock_doc = MagicMock()
+    mock_doc.id = "note-123"
+    mock_doc.to_dict.return_value = {
+        "title": "Test Note",
+        "updated_at": "2024-01-01T00:00:00Z"
+    }
+    
+    notes_query(mock_firestore).limit.return_value.stream.return_value = [mock_doc]
+    
+    response = client.get(
+        "/notes?fields=title",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == [{"id": "note-123", "title": "Test Note"}]
+    user_notes(mock_firestore).select.assert_called_once_with(["title", "updated_at"])
+
+def test_get_notes_unknown_field(mock_firebase_auth, mock_firestore):
+    """Test that unknown projection fields are rejected"""
+    response = client.get(
+        "/notes?fields=title,secret",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 400
+
+def test_export_notes_streams_all_notes(mock_firebase_auth, mock_firestore):
+    """Test exporting all notes as a streamed JSON array"""
+    docs = []
+    for i in range(3):
+        mock_doc = MagicMock()
+        mock_doc.id = f"note-{i}"
+        mock_doc.to_dict.return_value = {
+            "title": f"Note {i}",
+            "content": "Content",
+            "user_id": MOCK_USER_ID,
+            "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": "2024-01-01T00:00:00Z"
+        }
+        docs.append(mock_doc)
+    
+    user_notes(mock_firestore).order_by.return_value.stream.return_value = iter(docs)
+    
+    response = client.get(
+        "/notes/export",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert [note["id"] for note in response.json()] == ["note-0", "note-1", "note-2"]
+
+def test_export_notes_empty(mock_firebase_auth, mock_firestore):
+    """Test exporting when the user has no notes"""
+    user_notes(mock_firestore).order_by.return_value.stream.return_value = iter([])
+    
+    response = client.get(
+        "/notes/export",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_export_notes_query_failure(mock_firebase_auth, mock_firestore):
+    """Test that a query failing before the first note returns an error status"""
+    def failing_stream():
+        raise Exception("permission denied")
+        yield
+    
+    user_notes(mock_firestore).order_by.return_value.stream.return_value = failing_stream()
+    
+    response = client.get(
+        "/notes/export",
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 500
+
+def test_get_notes_gzip_compressed(mock_firebase_auth, mock_firestore):
+    """Test that large note lists are gzip-compressed for clients that accept it"""
+    mock_doc = MagicMock()
+    mock_doc.id = "note-123"
+    mock_doc.to_dict.return_value = {
+        "title": "Long Note",
+        "content": "Lorem ipsum dolor sit amet. " * 100,
+        "user_id": MOCK_USER_ID,
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z"
+    }
+    
+    notes_query(mock_firestore).limit.return_value.stream.return_value = [mock_doc]
+    
+    response = client.get(
+        "/notes",
+        headers={
+            "Authorization": f"Bearer {MOCK_USER_TOKEN}",
+            "Accept-Encoding": "gzip"
+        }
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()[0]["title"] == "Long Note"
+
+def test_verified_token_is_cached(mock_firebase_auth, mock_firestore):
+    """Test that a verified token is reused until it expires"""
+    mock_firebase_auth.return_value = {
+        'uid': MOCK_USER_ID,
+        'email': 'test@example.com',
+        'exp': time.time() + 3600
+    }
+    notes_query(mock_firestore).limit.return_value.stream.return_value = []
+    
+    for _ in range(2):
+        response = client.get(
+            "/notes",
+            headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+        )
+        assert response.status_code == 200
+    
+    mock_firebase_auth.assert_called_once_with(MOCK_USER_TOKEN)
+
+def test_empty_bearer_token_rejected(mock_firebase_auth):
+    """Test that a Bearer header without a token is rejected before verification"""
+    response = client.get("/notes", headers={"Authorization": "Bearer "})
+    
+    assert response.status_code == 401
+    mock_firebase_auth.assert_not_called()
+
+def test_lifespan_starts_certificate_refresh(signing_key):
+    """Test that app startup loads the signing keys before serving and keeps refreshing"""
+    _, pem = signing_key
+    
+    def load_keys():
+        main._signing_keys = {"test-kid": pem}
+        return 3600
+    
+    with patch('main.prime_certificate_cache', side_effect=load_keys), \
+         patch('main.refresh_certificates', new_callable=AsyncMock) as mock_refresh:
+        with TestClient(app) as lifespan_client:
+            assert set(main._signing_keys) == {"test-kid"}
+            assert lifespan_client.get("/").status_code == 200
+        mock_refresh.assert_awaited_once_with(3600)
+
+def test_lifespan_starts_when_certificate_fetch_fails():
+    """Test that a failed certificate fetch does not block startup"""
+    with patch('main.prime_certificate_cache', side_effect=Exception("unreachable")), \
+         patch('main.refresh_certificates', new_callable=AsyncMock) as mock_refresh:
+        with TestClient(app) as lifespan_client:
+            assert lifespan_client.get("/").status_code == 200
+        mock_refresh.assert_awaited_once_with(main.CERT_REFRESH_MIN)
+
+def test_prime_certificate_cache_uses_max_age(signing_key):
+    """Test that certificate priming parses the keys and reports the max-age"""
+    _, pem = signing_key
+    with patch('main.auth._get_client') as mock_get_client, \
+         patch('main.firebase_admin.get_app') as mock_get_app:
+        mock_request = mock_get_client.return_value._token_verifier.request
+        mock_request.return_value.headers = {
+            "Cache-Control": "public, max-age=19204, must-revalidate, no-transform"
+        }
+        mock_request.return_value.data = json.dumps({"test-kid": pem}).encode()
+        mock_get_app.return_value.project_id = "test-project"
+        
+        assert prime_certificate_cache() == 19204
+        mock_request.assert_called_once_with(FIREBASE_CERT_URL)
+        assert set(main._signing_keys) == {"test-kid"}
+        assert main._signing_project_id == "test-project"
+
+def test_token_verified_with_cached_signing_key(signing_key, mock_firebase_auth, mock_firestore):
+    """Test that tokens signed by a known key skip the Firebase SDK"""
+    private_key, _ = signing_key
+    main._signing_keys = {"test-kid": private_key.public_key()}
+    main._signing_project_id = "test-project"
+    now = int(time.time())
+    claims = {
+        "iss": "https://securetoken.google.com/test-project",
+        "aud": "test-project",
+        "sub": MOCK_USER_ID,
+        "iat": now,
+        "exp": now + 3600
+    }
+    notes_query(mock_firestore).limit.return_value.stream.return_value = []
+    
+    token = jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": "test-kid"})
+    response = client.get("/notes", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    
+    expired = jwt.encode(
+        {**claims, "iat": now - 7200, "exp": now - 3600},
+        private_key, algorithm="RS256", headers={"kid": "test-kid"}
+    )
+    response = client.get("/notes", headers={"Authorization": f"Bearer {expired}"})
+    assert response.status_code == 401
+    
+    mock_firebase_auth.assert_not_called()
+
 def test_create_note_unauthorized():
     """Test creating note without authentication"""
     note_data = {
@@ -99,7 +475,8 @@ def test_create_note_authorized(mock_firebase_auth, mock_firestore):
     # Mock Firestore add operation
     mock_doc_ref = MagicMock()
     mock_doc_ref.id = "new-note-123"
-    mock_firestore.collection.return_value.add.return_value = (None, mock_doc_ref)
+    commit_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    user_notes(mock_firestore).add.return_value = (commit_time, mock_doc_ref)
     
     response = client.post(
         "/notes",
@@ -112,8 +489,10 @@ def test_create_note_authorized(mock_firebase_auth, mock_firestore):
     assert created_note["title"] == "New Note"
     assert created_note["content"] == "New Content"
     assert created_note["user_id"] == MOCK_USER_ID
+    assert created_note["created_at"] == commit_time.isoformat()
+    assert created_note["updated_at"] == commit_time.isoformat()
 
-def test_create_note_invalid_data():
+def test_create_note_invalid_data(mock_firebase_auth):
     """Test creating note with invalid data"""
     invalid_data = {
         "title": "",  # Empty title should fail validation
@@ -127,6 +506,165 @@ def test_create_note_invalid_data():
     )
     
     assert response.status_code == 422  # Validation error
+    assert response.json()["detail"][0]["loc"] == ["body", "title"]
+
+def test_create_note_missing_field(mock_firebase_auth):
+    """Test that a missing field is reported at the field itself"""
+    response = client.post(
+        "/notes",
+        json={"content": "Content"},
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"] == ["body", "title"]
+    assert error["type"] == "missing"
+
+def test_bulk_create_notes_missing_nested_field(mock_firebase_auth):
+    """Test that a missing field of a nested note is reported with its full path"""
+    response = client.post(
+        "/notes/bulk",
+        json={"notes": [{"content": "Content"}]},
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"] == ["body", "notes", 0, "title"]
+    assert error["type"] == "missing"
+
+def test_create_note_invalid_data_unauthorized():
+    """Test that authentication is checked before the body is validated"""
+    response = client.post("/notes", json={"title": ""})
+    assert response.status_code == 401
+    
+    response = client.post("/notes/bulk", json={"notes": []})
+    assert response.status_code == 401
+
+def test_bulk_create_notes_authorized(mock_firebase_auth, mock_firestore):
+    """Test bulk note creation is split into batches of at most 500 writes"""
+    notes = [{"title": f"Note {i}", "content": "Content"} for i in range(501)]
+    
+    doc_refs = [MagicMock(id=f"note-{i}") for i in range(501)]
+    user_notes(mock_firestore).document.side_effect = doc_refs
+    
+    response = client.post(
+        "/notes/bulk",
+        json={"notes": notes},
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["ids"] == [f"note-{i}" for i in range(501)]
+    assert mock_firestore.batch.call_count == 2
+    assert mock_firestore.batch.return_value.set.call_count == 501
+    assert mock_firestore.batch.return_value.commit.call_count == 2
+
+def test_bulk_create_notes_partial_failure(mock_firebase_auth, mock_firestore):
+    """Test that a failed batch reports the notes already committed and stops"""
+    notes = [{"title": f"Note {i}", "content": "Content"} for i in range(1200)]
+    
+    doc_refs = [MagicMock(id=f"note-{i}") for i in range(1200)]
+    user_notes(mock_firestore).document.side_effect = doc_refs
+    batches = [MagicMock(), MagicMock(), MagicMock()]
+    batches[1].commit.side_effect = Exception("unavailable")
+    mock_firestore.batch.side_effect = batches
+    
+    response = client.post(
+        "/notes/bulk",
+        json={"notes": notes},
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 500
+    assert response.json()["ids"] == [f"note-{i}" for i in range(500)]
+    batches[0].commit.assert_called_once()
+    batches[2].commit.assert_not_called()
+
+def test_batch_get_notes_authorized(mock_firebase_auth, mock_firestore):
+    """Test fetching several notes at once, skipping missing notes"""
+    own_doc = MagicMock()
+    own_doc.id = "note-1"
+    own_doc.exists = True
+    own_doc.to_dict.return_value = {
+        "title": "Own Note",
+        "content": "Content",
+        "user_id": MOCK_USER_ID,
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z"
+    }
+    missing_doc = MagicMock()
+    missing_doc.id = "note-3"
+    missing_doc.exists = False
+    
+    mock_firestore.get_all.return_value = [missing_doc, own_doc]
+    
+    response = client.post(
+        "/notes/batch-get",
+        json={"ids": ["note-1", "note-3", "note-1"]},
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 200
+    notes = response.json()
+    assert [note["id"] for note in notes] == ["note-1"]
+    mock_firestore.get_all.assert_called_once()
+    # Duplicate IDs are fetched only once
+    assert len(mock_firestore.get_all.call_args[0][0]) == 2
+
+def test_batch_get_notes_invalid_ids(mock_firebase_auth, mock_firestore):
+    """Test that IDs which are not a single document ID are rejected"""
+    for note_id in ["a/b", "", ".", ".."]:
+        response = client.post(
+            "/notes/batch-get",
+            json={"ids": [note_id]},
+            headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+        )
+        
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "ids", 0]
+    mock_firestore.get_all.assert_not_called()
+
+def test_create_note_malformed_json(mock_firebase_auth):
+    """Test creating note with a body that is not valid JSON"""
+    response = client.post(
+        "/notes",
+        content=b'{"title": "New Note",',
+        headers={
+            "Authorization": f"Bearer {MOCK_USER_TOKEN}",
+            "Content-Type": "application/json"
+        }
+    )
+    
+    assert response.status_code == 422
+
+def test_migrate_legacy_notes(mock_firestore):
+    """Test copying legacy notes to per-user paths, skipping migrated ones"""
+    legacy_docs = []
+    for note_id, owner in [("note-1", MOCK_USER_ID), ("note-2", MOCK_USER_ID), ("note-3", None)]:
+        mock_doc = MagicMock()
+        mock_doc.id = note_id
+        mock_doc.to_dict.return_value = {"title": "Legacy", "content": "Content", "user_id": owner}
+        legacy_docs.append(mock_doc)
+    mock_firestore.collection.return_value.stream.return_value = legacy_docs
+    
+    targets = {}
+    def target_ref(note_id):
+        return targets.setdefault(note_id, MagicMock(path=f"users/{MOCK_USER_ID}/notes/{note_id}"))
+    user_notes(mock_firestore).document.side_effect = target_ref
+    
+    # note-1 was copied by an earlier run
+    migrated = MagicMock(exists=True)
+    migrated.reference.path = f"users/{MOCK_USER_ID}/notes/note-1"
+    mock_firestore.get_all.return_value = [migrated, MagicMock(exists=False)]
+    
+    stats = migrate_legacy_notes(mock_firestore)
+    
+    assert stats == {"copied": 1, "skipped": 1, "invalid": 1}
+    batch = mock_firestore.batch.return_value
+    batch.set.assert_called_once_with(targets["note-2"], legacy_docs[1].to_dict.return_value)
+    batch.commit.assert_called_once()
 
 def test_update_note_authorized(mock_firebase_auth, mock_firestore):
     """Test updating note with authentication"""
@@ -147,9 +685,11 @@ def test_update_note_authorized(mock_firebase_auth, mock_firestore):
         "updated_at": "2024-01-01T00:00:00Z"
     }
     
+    commit_time = datetime(2024, 1, 2, tzinfo=timezone.utc)
     mock_doc_ref = MagicMock()
     mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    mock_doc_ref.update.return_value.update_time = commit_time
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.put(
         f"/notes/{note_id}",
@@ -160,6 +700,10 @@ def test_update_note_authorized(mock_firebase_auth, mock_firestore):
     assert response.status_code == 200
     updated_note = response.json()
     assert updated_note["title"] == "Updated Title"
+    assert updated_note["created_at"] == "2024-01-01T00:00:00Z"
+    assert updated_note["updated_at"] == commit_time.isoformat()
+    # Response is built locally instead of re-reading the document
+    mock_doc_ref.get.assert_called_once()
 
 def test_update_note_not_found(mock_firebase_auth, mock_firestore):
     """Test updating non-existent note"""
@@ -172,7 +716,7 @@ def test_update_note_not_found(mock_firebase_auth, mock_firestore):
     
     mock_doc_ref = MagicMock()
     mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.put(
         f"/notes/{note_id}",
@@ -182,25 +726,50 @@ def test_update_note_not_found(mock_firebase_auth, mock_firestore):
     
     assert response.status_code == 404
 
-def test_update_note_wrong_owner(mock_firebase_auth, mock_firestore):
-    """Test updating note that belongs to another user"""
+def test_update_note_scoped_to_user(mock_firebase_auth, mock_firestore):
+    """Test that notes are only looked up under the authenticated user's path"""
+    note_id = "note-123"
+    update_data = {"title": "Updated Title"}
+    
+    # Another user's note does not exist under this user's path
+    mock_doc = MagicMock()
+    mock_doc.exists = False
+    
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.get.return_value = mock_doc
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
+    
+    response = client.put(
+        f"/notes/{note_id}",
+        json=update_data,
+        headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
+    )
+    
+    assert response.status_code == 404
+    mock_firestore.collection.assert_called_with("users")
+    mock_firestore.collection.return_value.document.assert_called_with(MOCK_USER_ID)
+    user_notes(mock_firestore).document.assert_called_with(note_id)
+    mock_doc_ref.update.assert_not_called()
+
+def test_update_note_concurrent_modification(mock_firebase_auth, mock_firestore):
+    """Test updating note that changed after the ownership check"""
     note_id = "note-123"
     update_data = {"title": "Updated Title"}
     
-    # Mock document belonging to different user
     mock_doc = MagicMock()
     mock_doc.exists = True
     mock_doc.to_dict.return_value = {
-        "title": "Other User's Note",
-        "content": "Content",
-        "user_id": "other-user-456",  # Different user
+        "title": "Old Title",
+        "content": "Old Content",
+        "user_id": MOCK_USER_ID,
         "created_at": "2024-01-01T00:00:00Z",
         "updated_at": "2024-01-01T00:00:00Z"
     }
     
     mock_doc_ref = MagicMock()
     mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    mock_doc_ref.update.side_effect = FailedPrecondition("update_time mismatch")
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.put(
         f"/notes/{note_id}",
@@ -208,7 +777,7 @@ def test_update_note_wrong_owner(mock_firebase_auth, mock_firestore):
         headers={"Authorization": f"Bearer {MOCK_USER_TOKEN}"}
     )
     
-    assert response.status_code == 403
+    assert response.status_code == 409
 
 def test_delete_note_authorized(mock_firebase_auth, mock_firestore):
     """Test deleting note with authentication"""
@@ -227,7 +796,7 @@ def test_delete_note_authorized(mock_firebase_auth, mock_firestore):
     
     mock_doc_ref = MagicMock()
     mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.delete(
         f"/notes/{note_id}",
@@ -235,20 +804,18 @@ def test_delete_note_authorized(mock_firebase_auth, mock_firestore):
     )
     
     assert response.status_code == 204
-    # Verify delete was called
+    # Verify delete was called without reading the note first
     mock_doc_ref.delete.assert_called_once()
+    mock_doc_ref.get.assert_not_called()
 
 def test_delete_note_not_found(mock_firebase_auth, mock_firestore):
     """Test deleting non-existent note"""
     note_id = "non-existent"
     
-    # Mock non-existent document
-    mock_doc = MagicMock()
-    mock_doc.exists = False
-    
+    # Mock delete of a non-existent document
     mock_doc_ref = MagicMock()
-    mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    mock_doc_ref.delete.side_effect = NotFound("No document to update")
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.delete(
         f"/notes/{note_id}",
@@ -274,7 +841,7 @@ def test_get_single_note_authorized(mock_firebase_auth, mock_firestore):
     
     mock_doc_ref = MagicMock()
     mock_doc_ref.get.return_value = mock_doc
-    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+    user_notes(mock_firestore).document.return_value = mock_doc_ref
     
     response = client.get(
         f"/notes/{note_id}",